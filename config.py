@@ -1,16 +1,47 @@
 # config.py
 import os
+import pickle
 import yaml
 from pathlib import Path
 
+# Use the libyaml-backed loader when PyYAML was built against libyaml
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
 # Load the configuration file
 CONFIG_FILE = Path(__file__).parent / "config.yaml"
 
 if not CONFIG_FILE.exists():
     raise FileNotFoundError(f"Configuration file {CONFIG_FILE} not found.")
 
-with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
-    config = yaml.safe_load(f)
+# Cache of the parsed configuration, invalidated when config.yaml changes (mtime + size)
+CONFIG_CACHE_FILE = CONFIG_FILE.with_suffix('.cache.pkl')
+
+def load_config():
+    stat = CONFIG_FILE.stat()
+    cache_key = (stat.st_mtime_ns, stat.st_size)
+
+    try:
+        with open(CONFIG_CACHE_FILE, 'rb') as f:
+            cached_key, cached_config = pickle.load(f)
+        if cached_key == cache_key:
+            return cached_config
+    except Exception:
+        pass
+
+    with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
+        parsed_config = yaml.load(f, Loader=SafeLoader)
+
+    try:
+        with open(CONFIG_CACHE_FILE, 'wb') as f:
+            pickle.dump((cache_key, parsed_config), f, protocol=pickle.HIGHEST_PROTOCOL)
+    except OSError:
+        pass
+    return parsed_config
+
+config = load_config()
 
 # Pipeline Steps
 PIPELINE_STEPS = config.get('pipeline_steps', ["crawler", "pdf_doc_extractor", "embedding"])
@@ -48,6 +79,10 @@ DOWNLOAD_IMAGE = CRAWLER_PARAMS.get('download_image', False)
 DOWNLOAD_OTHER = CRAWLER_PARAMS.get('download_other', False)
 MAX_URLS = CRAWLER_PARAMS.get('max_urls', None)
 EXCLUDED_PATHS = CRAWLER_PARAMS.get('excluded_paths', ['product-selector'])
+CRAWLER_MAX_CONCURRENCY = CRAWLER_PARAMS.get('max_concurrency', 16)
+CRAWLER_POOL_MAXSIZE = CRAWLER_PARAMS.get('pool_maxsize', 64)
+CACHE_RAW_HTML = CRAWLER_PARAMS.get('cache_raw_html', True)
+VERIFY_SSL = CRAWLER_PARAMS.get('verify_ssl', True)
 
 # Checkpoint
 CHECKPOINT_FILE = config.get('checkpoint_file', os.path.join(OUTPUT_DIR, "checkpoint.json"))
@@ -59,4 +94,8 @@ LOG_LEVEL = config.get('logging', {}).get('log_level', "INFO")
 # Content Rewriter
 CONTENT_REWRITER_ENABLED = config.get('content_rewriter', {}).get('enabled', False)
 CONTENT_REWRITER_MODEL = config.get('content_rewriter', {}).get('model', "openai")
-CONTENT_REWRITER_API_KEY = config.get('content_rewriter', {}).get('api_key', "")
+# api_key accepts a single key or a list of keys used in rotation
+CONTENT_REWRITER_API_KEYS = config.get('content_rewriter', {}).get('api_key', "")
+if isinstance(CONTENT_REWRITER_API_KEYS, str):
+    CONTENT_REWRITER_API_KEYS = [CONTENT_REWRITER_API_KEYS]
+CONTENT_REWRITER_MAX_CONCURRENCY = config.get('content_rewriter', {}).get('max_concurrency', 64)
@@ -18,36 +18,49 @@ document.addEventListener('DOMContentLoaded', () => {
         appendLog('error', 'Déconnecté du serveur.');
     });
 
-    socket.on('log', (data) => {
+    function handleLog(data) {
         const level = data.level || 'info';
         const message = data.message || '';
         appendLog(level, message);
-    });
+    }
 
-    socket.on('download', (data) => {
+    function handleDownload(data) {
         const fileType = data.file_type || 'Inconnu';
         const filename = data.filename || 'Non nommé';
         appendDownload(fileType, filename);
-    });
-
-    socket.on('progress', (data) => {
-        appendProgress(data);
-    });
+    }
 
-    socket.on('embedding_processed', (data) => {
+    function handleEmbedding(data) {
         const filename = data.filename || 'Non nommé';
         const chunk_id = data.chunk_id || 'N/A';
         appendEmbedding(filename, chunk_id);
-    });
+    }
 
-    socket.on('content_extracted', (data) => {
+    function handleContentExtracted(data) {
         const filename = data.filename || 'Non nommé';
         appendContentExtracted(filename);
-    });
+    }
 
-    socket.on('content_rewritten', (data) => {
+    function handleContentRewritten(data) {
         const filename = data.filename || 'Non nommé';
         appendContentRewritten(filename);
+    }
+
+    // Chaque type d'événement peut arriver seul ou regroupé dans un lot (`<type>_batch`)
+    const handlers = {
+        log: handleLog,
+        download: handleDownload,
+        progress: appendProgress,
+        embedding_processed: handleEmbedding,
+        content_extracted: handleContentExtracted,
+        content_rewritten: handleContentRewritten
+    };
+
+    Object.entries(handlers).forEach(([eventType, handler]) => {
+        socket.on(eventType, handler);
+        socket.on(`${eventType}_batch`, (items) => {
+            items.forEach(handler);
+        });
     });
 
     socket.on('crawl_completed', (data) => {
@@ -1,6 +1,8 @@
 # main.py
 import threading
+import queue
 import time
+from pathlib import Path
 from flask import Flask, render_template
 from flask_socketio import SocketIO, emit
 import logging
@@ -19,8 +21,9 @@ from config import (
     EMBEDDING_PROVIDER,
     VERBOSE,
     CONTENT_REWRITER_ENABLED,
-    CONTENT_REWRITER_API_KEY,
-    CONTENT_REWRITER_MODEL
+    CONTENT_REWRITER_API_KEYS,
+    CONTENT_REWRITER_MODEL,
+    CONTENT_REWRITER_MAX_CONCURRENCY
 )
 from utils.event_manager import event_manager
 
@@ -33,51 +36,181 @@ socketio = SocketIO(app, async_mode='eventlet')
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Fonction d'écoute des événements
+# Émission d'un lot d'événements de même type vers le tableau de bord
+def emit_log_batch(items):
+    socketio.emit('log_batch', [
+        {'level': data.get('level', 'info'), 'message': data.get('message', '')}
+        for data in items
+    ])
+
+def emit_download_batch(items):
+    socketio.emit('download_batch', [
+        {'file_type': data.get('file_type'), 'filename': data.get('filename')}
+        for data in items
+    ])
+
+def emit_crawl_completed(items):
+    for data in items:
+        socketio.emit('crawl_completed', data)
+
+EVENT_DISPATCH = {
+    'log': emit_log_batch,
+    'download': emit_download_batch,
+    'crawl_completed': emit_crawl_completed,
+    **{
+        event_type: (lambda items, event_type=event_type: socketio.emit(f'{event_type}_batch', items))
+        for event_type in ('progress', 'embedding_processed', 'content_extracted', 'content_rewritten')
+    }
+}
+
+# Fonction d'écoute des événements (bloque jusqu'à l'arrivée d'un événement,
+# puis regroupe les événements en attente pour les émettre par lots)
 def event_listener():
     while True:
-        event = event_manager.get_event()
-        if event:
-            event_type = event.get('type')
-            data = event.get('data')
-            if event_type == 'log':
-                level = data.get('level', 'info')
-                message = data.get('message', '')
-                socketio.emit('log', {'level': level, 'message': message})
-            elif event_type == 'download':
-                file_type = data.get('file_type')
-                filename = data.get('filename')
-                socketio.emit('download', {'file_type': file_type, 'filename': filename})
-            elif event_type == 'progress':
-                socketio.emit('progress', data)
-            elif event_type == 'embedding_processed':
-                socketio.emit('embedding_processed', data)
-            elif event_type == 'content_extracted':
-                socketio.emit('content_extracted', data)
-            elif event_type == 'content_rewritten':
-                socketio.emit('content_rewritten', data)
-            elif event_type == 'crawl_completed':
-                socketio.emit('crawl_completed', data)
-        else:
-            time.sleep(0.1)
+        events = [event_manager.get_event()] + event_manager.drain(max_events=128)
+        batches = {}
+        for event in events:
+            if not isinstance(event, dict):
+                logger.error(f"Événement ignoré (format invalide) : {event!r}")
+                continue
+            items = batches.setdefault(event.get('type'), [])
+            if event.get('batch'):
+                items.extend(event.get('data') or [])
+            else:
+                items.append(event.get('data'))
+
+        for event_type, items in batches.items():
+            handler = EVENT_DISPATCH.get(event_type)
+            if handler:
+                # Une erreur d'émission ne doit pas arrêter l'écoute : la file se remplirait
+                # et les producteurs resteraient bloqués sur crawl_completed
+                try:
+                    handler(items)
+                except Exception as e:
+                    logger.error(f"Erreur lors de l'émission des événements {event_type} : {str(e)}")
 
 # Route pour le tableau de bord
 @app.route('/')
 def index():
     return render_template('index.html')
 
-# Démarrer le thread d'écoute des événements
-listener_thread = threading.Thread(target=event_listener, daemon=True)
-listener_thread.start()
+# Le thread d'écoute démarre à la première connexion et non à l'import : les workers du
+# pool de parsing du crawler (forkserver/spawn) ré-importent ce module
+listener_thread = None
+listener_lock = threading.Lock()
 
-# Fonction pour exécuter le pipeline
+def start_event_listener():
+    global listener_thread
+    with listener_lock:
+        if listener_thread is None:
+            listener_thread = threading.Thread(target=event_listener, daemon=True)
+            listener_thread.start()
+
+# Taille maximale des files entre deux étapes du pipeline
+STAGE_QUEUE_SIZE = 32
+
+# Fichiers déjà présents dans le répertoire d'entrée d'une étape (produits par les runs précédents)
+def list_files(directory, patterns):
+    return [file_path for pattern in patterns for file_path in Path(directory).glob(pattern)]
+
+# Alimente une étape avec les fichiers existants, puis avec ceux que l'étape précédente
+# produit pendant ce run. Un fichier reçu par la file est toujours transmis, même s'il faisait
+# partie des fichiers existants : la copie de la file est la version fraîche
+def feed_stage(existing_files, upstream_queue, output_queue):
+    try:
+        for file_path in existing_files:
+            output_queue.put(file_path)
+        if upstream_queue is not None:
+            while True:
+                item = upstream_queue.get()
+                if item is None:
+                    break
+                output_queue.put(item)
+    finally:
+        output_queue.put(None)
+
+# Exécute une étape : les workers consomment la file d'entrée jusqu'au sentinel None,
+# transmettent chaque résultat à l'étape suivante, puis propagent le sentinel
+def run_stage(process_item, input_queue, output_queue=None, num_workers=1):
+    def worker():
+        while True:
+            item = input_queue.get()
+            if item is None:
+                input_queue.put(None)  # Relaie le sentinel aux autres workers
+                break
+            try:
+                result = process_item(item)
+            except Exception as e:
+                logger.error(f"Erreur lors du traitement de {item} : {str(e)}")
+                event_manager.emit('log', {'level': 'error', 'message': f"Erreur lors du traitement de {item} : {str(e)}"})
+                continue
+            if result and output_queue is not None:
+                output_queue.put(result)
+
+    workers = [threading.Thread(target=worker, daemon=True) for _ in range(num_workers)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    if output_queue is not None:
+        output_queue.put(None)
+
+def crawl_stage(crawler, output_queue):
+    try:
+        crawler.crawl()
+    finally:
+        if output_queue is not None:
+            output_queue.put(None)
+
+def embedding_stage(embedding_processor, input_queue, output_queue):
+    # Les workers fichier ne font qu'attendre leurs chunks : la concurrence réelle est
+    # bornée par le pool de chunks partagé de l'EmbeddingProcessor
+    run_stage(embedding_processor.embed_file, input_queue, output_queue, num_workers=4)
+    # L'entrée couvre tout le répertoire des textes extraits (feed_stage) : chunks.json et
+    # embeddings.npy sont donc reconstruits pour tout le corpus, pas seulement pour ce run
+    embedding_processor.save_results()
+
+def rewriter_stage(content_rewriter, input_queue):
+    run_stage(content_rewriter.rewrite_file, input_queue, None, content_rewriter.max_concurrency)
+    content_rewriter.save_checkpoint()
+
+# Fonction pour exécuter le pipeline : les étapes tournent en parallèle, reliées par des files bornées
 def run_pipeline():
+    start_time = time.time()
+    errors = []
+
+    def start_stage(target, *args):
+        def runner():
+            try:
+                target(*args)
+            except Exception as e:
+                errors.append(str(e))
+                logger.error(f"Erreur critique dans le pipeline : {str(e)}")
+                event_manager.emit('log', {'level': 'error', 'message': f"Erreur critique dans le pipeline : {str(e)}"})
+        thread = threading.Thread(target=runner, daemon=True)
+        thread.start()
+        return thread
+
+    run_crawler = "crawler" in PIPELINE_STEPS
+    run_extractor = "pdf_doc_extractor" in PIPELINE_STEPS
+    run_embedding = "embedding" in PIPELINE_STEPS
+    run_rewriter = "content_rewriter" in PIPELINE_STEPS and CONTENT_REWRITER_ENABLED
+
+    # Sorties en flux de chaque étape, créées seulement si une étape en aval les consomme
+    crawled_queue = queue.Queue(maxsize=STAGE_QUEUE_SIZE) if run_crawler and run_extractor else None
+    extracted_queue = queue.Queue(maxsize=STAGE_QUEUE_SIZE) if run_extractor and (run_embedding or run_rewriter) else None
+    embedded_queue = queue.Queue(maxsize=STAGE_QUEUE_SIZE) if run_embedding and run_rewriter else None
+    # Entrées de chaque étape : fichiers déjà sur disque + sortie en flux de l'étape précédente
+    extractor_queue = queue.Queue(maxsize=STAGE_QUEUE_SIZE) if run_extractor else None
+    embedding_queue = queue.Queue(maxsize=STAGE_QUEUE_SIZE) if run_embedding else None
+    rewriter_queue = queue.Queue(maxsize=STAGE_QUEUE_SIZE) if run_rewriter else None
+
+    # Toutes les étapes sont construites avant d'en démarrer une : un échec de construction
+    # ne laisse aucune étape bloquée sur une file que personne ne consomme
     try:
-        if "crawler" in PIPELINE_STEPS:
-            crawler = WebCrawler(base_dir=CRAWLER_OUTPUT_DIR, resume=True)
-            crawler.crawl()
-        
-        if "pdf_doc_extractor" in PIPELINE_STEPS:
+        if run_crawler:
+            crawler = WebCrawler(base_dir=CRAWLER_OUTPUT_DIR, resume=True, output_queue=crawled_queue)
+        if run_extractor:
             extractor = PDFExtractor(
                 input_dir=CRAWLER_OUTPUT_DIR, 
                 output_dir=PDF_DOC_OUTPUT_DIR, 
@@ -85,10 +218,7 @@ def run_pipeline():
                 llm_provider=LLM_PROVIDER, 
                 verbose=VERBOSE
             )
-            extractor.process_all_pdfs()
-            extractor.process_all_docs()
-        
-        if "embedding" in PIPELINE_STEPS:
+        if run_embedding:
             embedding_processor = EmbeddingProcessor(
                 input_dir=PDF_DOC_OUTPUT_DIR, 
                 output_dir=EMBEDDING_OUTPUT_DIR, 
@@ -97,29 +227,78 @@ def run_pipeline():
                 embedding_provider=EMBEDDING_PROVIDER, 
                 verbose=VERBOSE
             )
-            embedding_processor.process_all_files()
-        
-        if "content_rewriter" in PIPELINE_STEPS and CONTENT_REWRITER_ENABLED:
+        if run_rewriter:
+            # Le rewriter travaille toujours sur les textes extraits, que l'embedding soit actif ou non
             content_rewriter = ContentRewriter(
-                input_dir=EMBEDDING_OUTPUT_DIR, 
+                input_dir=PDF_DOC_OUTPUT_DIR, 
                 output_dir=CONTENT_REWRITER_OUTPUT_DIR, 
-                api_key=CONTENT_REWRITER_API_KEY, 
+                api_keys=CONTENT_REWRITER_API_KEYS, 
                 model=CONTENT_REWRITER_MODEL, 
-                verbose=VERBOSE
+                verbose=VERBOSE,
+                max_concurrency=CONTENT_REWRITER_MAX_CONCURRENCY
             )
-            content_rewriter.rewrite_all_contents()
-        
-        logger.info("Pipeline terminé avec succès.")
-        event_manager.emit('log', {'level': 'info', 'message': "Pipeline terminé avec succès."})
-        event_manager.emit('crawl_completed', {'duration_seconds': 0, 'status': 'success'})  # Vous pouvez ajuster la durée
     except Exception as e:
         logger.error(f"Erreur critique dans le pipeline : {str(e)}")
         event_manager.emit('log', {'level': 'error', 'message': f"Erreur critique dans le pipeline : {str(e)}"})
-        event_manager.emit('crawl_completed', {'duration_seconds': 0, 'status': 'error', 'error': str(e)})
+        event_manager.emit('crawl_completed', {'duration_seconds': time.time() - start_time, 'status': 'error', 'error': str(e)})
+        return
+
+    # Les répertoires d'entrée sont listés avant le démarrage des étapes. Le crawler range ses
+    # téléchargements dans des sous-répertoires par type (PDF/, Doc/...).
+    # Seuls les documents dont le texte est absent ou périmé sont ré-extraits ; leurs fichiers
+    # texte actuels ne sont pas transmis d'emblée aux étapes suivantes, qui reçoivent la
+    # nouvelle version par la file (l'extracteur écrit via .tmp + os.replace)
+    pending_outputs = set()
+    if run_extractor:
+        downloaded_files = [
+            file_path for file_path in list_files(CRAWLER_OUTPUT_DIR, ('**/*.pdf', '**/*.doc', '**/*.docx'))
+            if not extractor.is_up_to_date(file_path)
+        ]
+        pending_outputs = {
+            output_file.resolve() for file_path in downloaded_files for output_file in extractor.output_files(file_path)
+        }
+    if run_embedding or run_rewriter:
+        extracted_files = [
+            file_path for file_path in list_files(PDF_DOC_OUTPUT_DIR, ('*.txt',))
+            if file_path.resolve() not in pending_outputs
+        ]
+
+    stages = []
+    if run_crawler:
+        stages.append(start_stage(crawl_stage, crawler, crawled_queue))
+
+    if run_extractor:
+        stages.append(start_stage(feed_stage, downloaded_files, crawled_queue, extractor_queue))
+        stages.append(start_stage(run_stage, extractor.process_file, extractor_queue, extracted_queue, 10))
+
+    if run_embedding:
+        stages.append(start_stage(feed_stage, extracted_files, extracted_queue, embedding_queue))
+        stages.append(start_stage(embedding_stage, embedding_processor, embedding_queue, embedded_queue))
+
+    if run_rewriter:
+        upstream_queue = embedded_queue if run_embedding else extracted_queue
+        stages.append(start_stage(feed_stage, extracted_files, upstream_queue, rewriter_queue))
+        stages.append(start_stage(rewriter_stage, content_rewriter, rewriter_queue))
+
+    for stage in stages:
+        stage.join()
+
+    duration = time.time() - start_time
+    dropped_events = event_manager.take_dropped()
+    if dropped_events:
+        logger.warning(f"{dropped_events} événement(s) non transmis au tableau de bord (file pleine)")
+        event_manager.emit('log', {'level': 'warning', 'message': f"{dropped_events} événement(s) non transmis au tableau de bord (file pleine)"})
+    if errors:
+        event_manager.emit('crawl_completed', {'duration_seconds': duration, 'status': 'error', 'error': "; ".join(errors), 'dropped_events': dropped_events})
+    else:
+        logger.info("Pipeline terminé avec succès.")
+        event_manager.emit('log', {'level': 'info', 'message': "Pipeline terminé avec succès."})
+        event_manager.emit('crawl_completed', {'duration_seconds': duration, 'status': 'success', 'dropped_events': dropped_events})
 
 # Démarrer le pipeline après la connexion d'un client
 @socketio.on('connect')
 def handle_connect():
+    start_event_listener()
     logger.info("Client connecté")
     event_manager.emit('log', {'level': 'info', 'message': "Client connecté"})
     threading.Thread(target=run_pipeline, daemon=True).start()
@@ -1,183 +1,331 @@
 # pipeline/content_rewriter.py
 import os
 import json
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
 from pathlib import Path
 import logging
 import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from itertools import cycle
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from itertools import cycle, islice
 from config import (
     CONTENT_REWRITER_OUTPUT_DIR,
-    CONTENT_REWRITER_API_KEY,
+    CONTENT_REWRITER_API_KEYS,
     CONTENT_REWRITER_MODEL,
-    VERBOSE
+    VERBOSE,
+    MAX_TOKENS
 )
 from utils.event_manager import event_manager
+from utils.adaptive_semaphore import AdaptiveSemaphore
+
+# Logger du module, configuré une seule fois : la console passe par les handlers du logger racine
+logger = logging.getLogger(__name__)
+if not logger.handlers:
+    file_handler = logging.FileHandler('content_rewriter.log', delay=True)  # Fichier ouvert au premier log seulement
+    file_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+    logger.addHandler(file_handler)
+
+SYSTEM_PROMPT = (
+    "Vous êtes un expert en réécriture de contenu. Reformulez le texte ci-dessous pour améliorer sa clarté et sa lisibilité tout en conservant le sens original."
+)
+
+def chat_messages(text):
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": text}
+    ]
+
+def anthropic_messages(text):
+    return [
+        {"role": "user", "content": text}
+    ]
+
+def parse_chat_completion(response_json):
+    return response_json['choices'][0]['message']['content']
+
+def parse_anthropic_message(response_json):
+    content_parts = response_json.get("content", [])
+    return "".join([part["text"] for part in content_parts if part["type"] == "text"])
+
+# Table de dispatch par fournisseur : seuls les messages sont construits à chaque appel
+PROVIDERS = {
+    "openai": {
+        "endpoint": "https://api.openai.com/v1/chat/completions",
+        "headers": {
+            "Authorization": "Bearer {api_key}",
+            "Content-Type": "application/json"
+        },
+        "payload": {
+            "model": "gpt-4",
+            "temperature": 0,
+            "max_tokens": 3000,
+            "top_p": 1
+        },
+        "messages": chat_messages,
+        "parse": parse_chat_completion
+    },
+    "anthropic": {
+        "endpoint": "https://api.anthropic.com/v1/messages",
+        "headers": {
+            "x-api-key": "{api_key}",
+            "anthropic-version": "2023-06-01",
+            "Content-Type": "application/json"
+        },
+        "payload": {
+            "model": "claude-3.5",
+            "max_tokens": 1024,
+            "stop_sequences": [],
+            "temperature": 0,
+            "top_p": 0,
+            "system": SYSTEM_PROMPT,
+            "stream": False
+        },
+        "messages": anthropic_messages,
+        "parse": parse_anthropic_message
+    },
+    "mistral": {
+        "endpoint": "https://api.mistral.ai/v1/chat/completions",
+        "headers": {
+            "Authorization": "Bearer {api_key}",
+            "Content-Type": "application/json",
+            "Accept": "application/json"
+        },
+        "payload": {
+            "model": "mistral-large-latest",
+            "temperature": 0.7,
+            "top_p": 1,
+            "max_tokens": 3000,
+            "stream": False
+        },
+        "messages": chat_messages,
+        "parse": parse_chat_completion
+    }
+}
 
 class ContentRewriter:
-    def __init__(self, input_dir, output_dir, api_key, model="openai", verbose=False):
+    def __init__(self, input_dir, output_dir, api_keys, model="openai", verbose=False, max_concurrency=64):
         self.input_dir = Path(input_dir)
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(parents=True, exist_ok=True)
+        # Chemins de sortie construits par simple concaténation de chaînes dans la boucle chaude
+        self.output_prefix = str(self.output_dir) + os.sep
+        self.output_suffix = '_rewritten.txt'
         
-        self.api_key = api_key
         self.model = model.lower()
+        self.provider = PROVIDERS.get(self.model)
+
+        # Rotation des clés API : les limites de débit des fournisseurs s'appliquent par clé.
+        # Les en-têtes sont construits une seule fois par clé.
+        self.api_keys = [api_keys] if isinstance(api_keys, str) else list(api_keys)
+        header_templates = self.provider["headers"] if self.provider else {}
+        self.headers_cycle = cycle([
+            {name: value.format(api_key=key) for name, value in header_templates.items()}
+            for key in self.api_keys
+        ])
+        self.lock = threading.Lock()
         self.verbose = verbose
+        self.max_concurrency = max_concurrency
+        # Nombre d'appels LLM simultanés, réduit de moitié sur 429/5xx puis réaugmenté progressivement
+        self.concurrency = AdaptiveSemaphore(max_permits=max_concurrency)
+        # Budget d'entrée estimé (~4 caractères par token) : au-delà, l'API rejetterait la requête
+        self.chars_per_token = 4
+        self.max_input_chars = MAX_TOKENS * self.chars_per_token
+        self.small_file_size = 256
+
+        # Session partagée entre les workers : réutilise les connexions TCP/TLS vers l'API
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=20, pool_maxsize=self.max_concurrency)
+        self.session.mount("https://", adapter)
+
+        self.logger = logger
+        self.logger.setLevel(logging.INFO if not verbose else logging.DEBUG)
+
+        # Checkpoint par fichier : chemin d'entrée -> [mtime_ns de l'entrée, fichier réécrit]
+        self.checkpoint_file = self.output_dir / '.checkpoint.json'
+        self.checkpoint_lock = threading.Lock()
+        self.checkpoint_interval = 20
+        self.unsaved_checkpoint_entries = 0
+        self.checkpoint = self.load_checkpoint()
+
+    def load_checkpoint(self):
+        if not self.checkpoint_file.exists():
+            return {}
+        try:
+            with open(self.checkpoint_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            self.logger.error(f"Erreur lors du chargement du checkpoint {self.checkpoint_file} : {str(e)}")
+            event_manager.emit('log', {'level': 'error', 'message': f"Erreur lors du chargement du checkpoint {self.checkpoint_file} : {str(e)}"})
+            return {}
+
+    def save_checkpoint(self):
+        with self.checkpoint_lock:
+            tmp_file = self.checkpoint_file.with_suffix('.tmp')
+            try:
+                with open(tmp_file, 'w', encoding='utf-8') as f:
+                    json.dump(self.checkpoint, f, ensure_ascii=False)
+                os.replace(tmp_file, self.checkpoint_file)
+                self.unsaved_checkpoint_entries = 0
+            except Exception as e:
+                self.logger.error(f"Erreur lors de la sauvegarde du checkpoint {self.checkpoint_file} : {str(e)}")
+                event_manager.emit('log', {'level': 'error', 'message': f"Erreur lors de la sauvegarde du checkpoint {self.checkpoint_file} : {str(e)}"})
+
+    def is_already_rewritten(self, file_path, input_mtime_ns, output_file_name):
+        entry = self.checkpoint.get(str(file_path))
+        return bool(entry) and entry[0] == input_mtime_ns and os.path.exists(output_file_name)
 
-        logging.basicConfig(
-            level=logging.INFO if not verbose else logging.DEBUG,
-            format='%(asctime)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.FileHandler('content_rewriter.log'),
-                logging.StreamHandler()
-            ]
-        )
-        self.logger = logging.getLogger(__name__)
-
-    def rewrite_content(self, text, document_name, file_name):
-        system_prompt = (
-            "Vous êtes un expert en réécriture de contenu. Reformulez le texte ci-dessous pour améliorer sa clarté et sa lisibilité tout en conservant le sens original."
-        )
-        user_content = text
-
-        if self.model == "openai":
-            endpoint = "https://api.openai.com/v1/chat/completions"
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
-            payload = {
-                "model": "gpt-4",
-                "messages": [
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_content}
-                ],
-                "temperature": 0,
-                "max_tokens": 3000,
-                "top_p": 1
-            }
-        elif self.model == "anthropic":
-            endpoint = "https://api.anthropic.com/v1/messages"
-            headers = {
-                "x-api-key": self.api_key,
-                "anthropic-version": "2023-06-01",
-                "Content-Type": "application/json"
-            }
-            payload = {
-                "model": "claude-3.5",
-                "max_tokens": 1024,
-                "stop_sequences": [],
-                "temperature": 0,
-                "top_p": 0,
-                "system": system_prompt,
-                "messages": [
-                    {"role": "user", "content": user_content}
-                ],
-                "stream": False
-            }
-        elif self.model == "mistral":
-            endpoint = "https://api.mistral.ai/v1/chat/completions"
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json",
-                "Accept": "application/json"
-            }
-            payload = {
-                "model": "mistral-large-latest",
-                "messages": [
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_content}
-                ],
-                "temperature": 0.7,
-                "top_p": 1,
-                "max_tokens": 3000,
-                "stream": False
-            }
+    def mark_rewritten(self, file_path, input_mtime_ns, output_file_name):
+        with self.checkpoint_lock:
+            self.checkpoint[str(file_path)] = [input_mtime_ns, output_file_name]
+            self.unsaved_checkpoint_entries += 1
+            should_save = self.unsaved_checkpoint_entries >= self.checkpoint_interval
+        if should_save:
+            self.save_checkpoint()
+
+    def emit_log(self, log_buf, entry):
+        if log_buf is None:
+            event_manager.emit('log', entry)
         else:
+            log_buf.append(entry)
+
+    def rewrite_content(self, text, document_name, file_name, log_buf=None):
+        if self.provider is None:
             self.logger.error(f"Fournisseur LLM inconnu : {self.model}")
-            event_manager.emit('log', {'level': 'error', 'message': f"Fournisseur LLM inconnu : {self.model}"})
+            self.emit_log(log_buf, {'level': 'error', 'message': f"Fournisseur LLM inconnu : {self.model}"})
             return None
 
+        with self.lock:
+            headers = next(self.headers_cycle)
+
+        endpoint = self.provider["endpoint"]
+        payload = {**self.provider["payload"], "messages": self.provider["messages"](text)}
+
         if self.verbose:
             self.logger.info(f"Appel LLM {self.model} pour {document_name} : {payload}")
-            event_manager.emit('log', {'level': 'info', 'message': f"Appel LLM {self.model} pour {document_name}"})
+            self.emit_log(log_buf, {'level': 'info', 'message': f"Appel LLM {self.model} pour {document_name}"})
 
         try:
-            response = requests.post(endpoint, headers=headers, json=payload, timeout=60)
+            with self.concurrency:
+                response = self.session.post(endpoint, headers=headers, data=orjson.dumps(payload), timeout=60)
+            self.concurrency.record(response.status_code)
             response.raise_for_status()
         except requests.HTTPError as e:
             self.logger.error(f"Erreur API LLM {self.model} : {str(e)}, réponse : {response.text}")
-            event_manager.emit('log', {'level': 'error', 'message': f"Erreur API LLM {self.model} : {str(e)}, réponse : {response.text}"})
+            self.emit_log(log_buf, {'level': 'error', 'message': f"Erreur API LLM {self.model} : {str(e)}, réponse : {response.text}"})
             return None
         except Exception as e:
             self.logger.error(f"Erreur lors de l'appel LLM {self.model} : {str(e)}")
-            event_manager.emit('log', {'level': 'error', 'message': f"Erreur lors de l'appel LLM {self.model} : {str(e)}"})
+            self.emit_log(log_buf, {'level': 'error', 'message': f"Erreur lors de l'appel LLM {self.model} : {str(e)}"})
             return None
 
-        response_json = response.json()
-        if self.model == "openai":
-            rewritten_text = response_json['choices'][0]['message']['content']
-        elif self.model == "anthropic":
-            content_parts = response_json.get("content", [])
-            rewritten_text = "".join([part["text"] for part in content_parts if part["type"] == "text"])
-        elif self.model == "mistral":
-            rewritten_text = response_json['choices'][0]['message']['content']
-        else:
-            rewritten_text = ""
-
+        # Décodage complet avec orjson : sur des réponses de quelques Ko, il reste plus rapide
+        # qu'un parseur incrémental (ijson), et seul le champ utile est ensuite lu
+        rewritten_text = self.provider["parse"](orjson.loads(response.content))
         return rewritten_text
 
-    def rewrite_file(self, file_path):
-        document_name = file_path.stem
-        self.logger.info(f"Réécriture du contenu de {file_path.name}")
-        event_manager.emit('log', {'level': 'info', 'message': f"Réécriture du contenu de {file_path.name}"})
+    def rewrite_file(self, file_path, input_mtime_ns=None, input_size=None):
+        # Les logs d'un fichier sont regroupés et envoyés au tableau de bord en un seul événement
+        log_buf = []
+        try:
+            # Accepte un Path (pipeline en flux) ou une chaîne issue de os.scandir
+            file_path = os.fspath(file_path)
+            file_name = os.path.basename(file_path)
+            document_name = os.path.splitext(file_name)[0]
+            output_file_name = self.output_prefix + document_name + self.output_suffix
+            if input_mtime_ns is None or input_size is None:
+                stat = os.stat(file_path)
+                input_mtime_ns, input_size = stat.st_mtime_ns, stat.st_size
+            if self.is_already_rewritten(file_path, input_mtime_ns, output_file_name):
+                self.logger.info(f"Déjà réécrit, ignoré : {file_name}")
+                self.emit_log(log_buf, {'level': 'info', 'message': f"Déjà réécrit, ignoré : {file_name}"})
+                return True
 
-        with open(file_path, 'r', encoding='utf-8') as f:
-            text = f.read()
+            # Fichier vide : inutile de l'ouvrir
+            if input_size == 0:
+                self.logger.warning(f"Aucun texte à réécrire dans {file_name}")
+                self.emit_log(log_buf, {'level': 'warning', 'message': f"Aucun texte à réécrire dans {file_name}"})
+                return False
 
-        if not text.strip():
-            self.logger.warning(f"Aucun texte à réécrire dans {file_path.name}")
-            event_manager.emit('log', {'level': 'warning', 'message': f"Aucun texte à réécrire dans {file_path.name}"})
-            return False
+            self.logger.info(f"Réécriture du contenu de {file_name}")
+            self.emit_log(log_buf, {'level': 'info', 'message': f"Réécriture du contenu de {file_name}"})
 
-        rewritten_text = self.rewrite_content(text, document_name, file_path.name)
-        if not rewritten_text:
-            self.logger.warning(f"Réécriture échouée pour {file_path.name}")
-            event_manager.emit('log', {'level': 'warning', 'message': f"Réécriture échouée pour {file_path.name}"})
-            return False
+            with open(file_path, 'r', encoding='utf-8') as f:
+                text = f.read(self.max_input_chars + 1)
 
-        output_file_name = self.output_dir / f"{document_name}_rewritten.txt"
-        try:
-            with open(output_file_name, 'w', encoding='utf-8') as f:
-                f.write(rewritten_text)
-            self.logger.info(f"Fichier réécrit créé : {output_file_name}")
-            event_manager.emit('log', {'level': 'info', 'message': f"Fichier réécrit créé : {output_file_name}"})
-            event_manager.emit('content_rewritten', {'filename': output_file_name.name})
-        except Exception as e:
-            self.logger.error(f"Erreur lors de la sauvegarde de {file_path} : {str(e)}")
-            event_manager.emit('log', {'level': 'error', 'message': f"Erreur lors de la sauvegarde de {file_path} : {str(e)}"})
-            return False
-        return True
+            if len(text) > self.max_input_chars:
+                text = text[:self.max_input_chars].rsplit(' ', 1)[0]
+                self.logger.warning(f"Texte tronqué à {len(text)} caractères pour {file_name}")
+                self.emit_log(log_buf, {'level': 'warning', 'message': f"Texte tronqué à {len(text)} caractères pour {file_name}"})
+
+            # Seuls les petits fichiers peuvent raisonnablement ne contenir que des blancs
+            if input_size < self.small_file_size and not text.strip():
+                self.logger.warning(f"Aucun texte à réécrire dans {file_name}")
+                self.emit_log(log_buf, {'level': 'warning', 'message': f"Aucun texte à réécrire dans {file_name}"})
+                return False
+
+            rewritten_text = self.rewrite_content(text, document_name, file_name, log_buf)
+            if not rewritten_text:
+                self.logger.warning(f"Réécriture échouée pour {file_name}")
+                self.emit_log(log_buf, {'level': 'warning', 'message': f"Réécriture échouée pour {file_name}"})
+                return False
+
+            # Écriture atomique : un fichier réécrit n'existe jamais à moitié écrit
+            tmp_file_name = output_file_name + '.tmp'
+            try:
+                with open(tmp_file_name, 'w', encoding='utf-8') as f:
+                    f.write(rewritten_text)
+                os.replace(tmp_file_name, output_file_name)
+                self.mark_rewritten(file_path, input_mtime_ns, output_file_name)
+                self.logger.info(f"Fichier réécrit créé : {output_file_name}")
+                self.emit_log(log_buf, {'level': 'info', 'message': f"Fichier réécrit créé : {output_file_name}"})
+                event_manager.emit('content_rewritten', {'filename': document_name + self.output_suffix})
+            except Exception as e:
+                self.logger.error(f"Erreur lors de la sauvegarde de {file_path} : {str(e)}")
+                self.emit_log(log_buf, {'level': 'error', 'message': f"Erreur lors de la sauvegarde de {file_path} : {str(e)}"})
+                return False
+            return True
+        finally:
+            event_manager.emit_many('log', log_buf)
+
+    def txt_entries(self, input_dir):
+        # Un tuple (chemin, mtime_ns, taille) par fichier, sans objet Path intermédiaire
+        with os.scandir(input_dir) as it:
+            for entry in it:
+                if entry.name.endswith('.txt') and entry.is_file():
+                    stat = entry.stat()
+                    yield entry.path, stat.st_mtime_ns, stat.st_size
 
     def rewrite_all_contents(self):
-        txt_files = list(self.input_dir.glob('*.txt'))
-        total_files = len(txt_files)
-        self.logger.info(f"Démarrage de la réécriture de {total_files} fichier(s)")
-        event_manager.emit('log', {'level': 'info', 'message': f"Démarrage de la réécriture de {total_files} fichier(s)"})
-
-        with ThreadPoolExecutor(max_workers=10) as executor:
-            futures = {executor.submit(self.rewrite_file, txt_file_path): txt_file_path for txt_file_path in txt_files}
-
-            for future in as_completed(futures):
-                txt_file_path = futures[future]
-                try:
-                    result = future.result()
-                    if result:
-                        self.logger.info(f"Réécriture réussie pour {txt_file_path.name}")
-                        event_manager.emit('log', {'level': 'info', 'message': f"Réécriture réussie pour {txt_file_path.name}"})
-                except Exception as e:
-                    self.logger.error(f"Erreur lors de la réécriture de {txt_file_path.name} : {str(e)}")
-                    event_manager.emit('log', {'level': 'error', 'message': f"Erreur lors de la réécriture de {txt_file_path.name} : {str(e)}"})
-        self.logger.info("Réécriture de contenu terminée.")
-        event_manager.emit('log', {'level': 'info', 'message': "Réécriture de contenu terminée."})
+        # Les fichiers sont soumis au fur et à mesure : au plus max_concurrency * 2 tâches en vol
+        txt_entries = self.txt_entries(str(self.input_dir))
+        max_workers = self.max_concurrency
+        max_in_flight = max_workers * 2
+        self.logger.info(f"Démarrage de la réécriture des fichiers de {self.input_dir}")
+        event_manager.emit('log', {'level': 'info', 'message': f"Démarrage de la réécriture des fichiers de {self.input_dir}"})
+
+        total_files = 0
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending = {executor.submit(self.rewrite_file, path, mtime_ns, size): path for path, mtime_ns, size in islice(txt_entries, max_in_flight)}
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    file_name = os.path.basename(pending.pop(future))
+                    total_files += 1
+                    try:
+                        result = future.result()
+                        if result:
+                            self.logger.info(f"Réécriture réussie pour {file_name}")
+                            event_manager.emit('log', {'level': 'info', 'message': f"Réécriture réussie pour {file_name}"})
+                    except Exception as e:
+                        self.logger.error(f"Erreur lors de la réécriture de {file_name} : {str(e)}")
+                        event_manager.emit('log', {'level': 'error', 'message': f"Erreur lors de la réécriture de {file_name} : {str(e)}"})
+
+                for path, mtime_ns, size in islice(txt_entries, max_in_flight - len(pending)):
+                    pending[executor.submit(self.rewrite_file, path, mtime_ns, size)] = path
+
+        self.save_checkpoint()
+        self.logger.info(f"Réécriture de contenu terminée ({total_files} fichier(s)).")
+        event_manager.emit('log', {'level': 'info', 'message': f"Réécriture de contenu terminée ({total_files} fichier(s))."})
@@ -1,22 +1,32 @@
 # pipeline/crawler.py
 import os
+import sys
 import logging
 import time
 import hashlib
+import shutil
+import gzip
 import re
 import html2text
-import json
+import orjson
 import datetime
+import threading
+import multiprocessing
 import requests
 from bs4 import BeautifulSoup
+from selectolax.parser import HTMLParser
 from pathlib import Path
-from urllib.parse import urljoin, urlparse
-from collections import defaultdict, deque
+from queue import Queue
+from urllib.parse import urljoin, urlparse, urlsplit, urldefrag
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 from xml.etree.ElementTree import Element, SubElement, ElementTree
 from typing import Optional, Set, Dict, List
 from math import ceil
+from functools import lru_cache
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
+import urllib3
 from urllib3.exceptions import InsecureRequestWarning
 from config import (
     START_URL,
@@ -33,16 +43,82 @@ from config import (
     CRAWLER_OUTPUT_DIR,
     CHECKPOINT_FILE,
     VERBOSE,
-    EXCLUDED_PATHS
+    EXCLUDED_PATHS,
+    CRAWLER_MAX_CONCURRENCY,
+    CRAWLER_POOL_MAXSIZE,
+    CACHE_RAW_HTML,
+    VERIFY_SSL
 )
 import subprocess
-from utils.event_manager import event_manager
-
-# Disable SSL warnings
-requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
+from utils.event_manager import event_manager, EventManagerHandler
+from utils.url_utils import canonicalize_url, canonicalize_split, canonical_netloc
+
+# Control characters (C0, DEL and C1) are stripped with str.translate, which runs entirely in C
+CONTROL_CHARS_TABLE = dict.fromkeys([*range(0x00, 0x20), *range(0x7F, 0xA0)])
+
+# Patterns compiled once at import time (clean_text / sanitize_filename run on every page and file)
+HORIZONTAL_SPACE_RE = re.compile(r'[ \t]+')
+BLANK_LINES_RE = re.compile(r'\n\s*\n')
+UNSAFE_FILENAME_CHARS_RE = re.compile(r'[^\w\-_.]')
+
+# Short, stable URL digest used in saved file names. The same URL is often sanitized
+# several times (content page, then its downloads), so recent results are cached
+@lru_cache(maxsize=4096)
+def url_digest(url: str) -> str:
+    return hashlib.sha1(url.encode()).hexdigest()[:8]
+
+def clean_text(text: str) -> str:
+    if not text:
+        return ""
+    text = text.translate(CONTROL_CHARS_TABLE)
+    text = HORIZONTAL_SPACE_RE.sub(' ', text)
+    text = BLANK_LINES_RE.sub('\n\n', text)
+    return text.strip()
+
+def new_html_converter() -> html2text.HTML2Text:
+    converter = html2text.HTML2Text()
+    converter.ignore_links = False
+    converter.body_width = 0
+    converter.ignore_images = True
+    converter.single_line_break = False
+    return converter
+
+# Parses one page and converts its main content to markdown. This is the CPU-heavy part of
+# Phase 2 and runs in a worker process, so it only takes and returns plain data.
+# Returns (content, link_urls); content is None when the page has no main content.
+def extract_page(url: str, page_content: str):
+    soup = BeautifulSoup(page_content, 'lxml')
+    for element in soup.find_all(['nav', 'header', 'footer', 'script', 'style', 'aside', 'iframe']):
+        element.decompose()
+
+    main_content = (soup.find('main') or soup.find('article') or 
+                    soup.find('div', class_='content') or soup.find('div', id='content'))
+    if not main_content:
+        return None, []
+
+    # Single pass over the links: make them absolute for the markdown output
+    # and collect them so the crawler can pick out downloadable targets
+    link_urls = []
+    for tag in main_content.find_all(['a', 'embed', 'iframe', 'object'], href=True):
+        attr = 'href' if tag.name == 'a' else 'src'
+        href = tag.get(attr)
+        if href:
+            tag[attr] = urljoin(url, href)
+        link_urls.append(urljoin(url, tag['href']))
+
+    markdown_content = new_html_converter().handle(str(main_content))
+
+    title = soup.find('h1')
+    content_parts = []
+    if title:
+        content_parts.append(f"# {title.get_text().strip()}")
+    content_parts.append(f"**Source:** {url}")
+    content_parts.append(markdown_content)
+
+    return clean_text('\n\n'.join(content_parts)), link_urls
 
 class WebCrawler:
-    def __init__(self, base_dir: str, resume: bool = False):
+    def __init__(self, base_dir: str, resume: bool = False, output_queue: Optional[Queue] = None):
         self.start_url = START_URL
         self.max_depth = MAX_DEPTH
         self.use_playwright = USE_PLAYWRIGHT
@@ -59,11 +135,18 @@ class WebCrawler:
         self.max_urls = MAX_URLS
         self.base_dir = Path(base_dir)
         self.base_dir.mkdir(parents=True, exist_ok=True)
+        # Downloaded file paths are pushed here so the next pipeline stage can start right away
+        self.output_queue = output_queue
 
         self.visited_pages = set()
         self.downloaded_files = set()
-        self.domain = urlparse(self.start_url).netloc
+        self.content_hashes = set()  # SHA-256 of every downloaded file
+        # Canonical netloc, compared against the canonical netloc of every discovered link
+        self.domain = urlsplit(canonicalize_url(self.start_url)).netloc
         self.site_map: Dict[str, Set[str]] = defaultdict(set)
+        # visited_pages and site_map hold canonical keys; the URL actually fetched (and used as
+        # the base for relative links) is kept here whenever it differs from its key
+        self.page_urls: Dict[str, str] = {}
 
         # Setup logging
         (self.base_dir / 'logs').mkdir(parents=True, exist_ok=True)
@@ -77,6 +160,9 @@ class WebCrawler:
             ]
         )
         self.logger = logging.getLogger(__name__)
+        # Log records reach the dashboard through this handler (added once per process)
+        if not any(isinstance(h, EventManagerHandler) for h in self.logger.handlers):
+            self.logger.addHandler(EventManagerHandler())
 
         self.stats = defaultdict(int)
         self.downloadable_extensions = {
@@ -89,6 +175,14 @@ class WebCrawler:
         }
         self.downloadable_extensions = {k: v for k, v in self.downloadable_extensions.items() if v}
         self.all_downloadable_exts = {ext for exts in self.downloadable_extensions.values() for ext in exts}
+        # Extension patterns depend only on the download settings, so they are compiled once here
+        self.downloadable_pattern = re.compile(
+            r'\.(' + '|'.join(ext.strip('.') for ext in self.all_downloadable_exts) + r')(\.[a-z0-9]+)?$', re.IGNORECASE
+        ) if self.all_downloadable_exts else None
+        self.extension_patterns = {
+            ext: re.compile(re.escape(ext) + r'(\.[a-z0-9]+)?$', re.IGNORECASE)
+            for ext in self.all_downloadable_exts
+        }
 
         self.content_type_mapping = {
             'PDF': {'application/pdf': '.pdf'},
@@ -126,11 +220,6 @@ class WebCrawler:
         }
 
         self.session = self.setup_session()
-        self.html_converter = html2text.HTML2Text()
-        self.html_converter.ignore_links = False
-        self.html_converter.body_width = 0
-        self.html_converter.ignore_images = True
-        self.html_converter.single_line_break = False
 
         # Extract language pattern from start URL (optional)
         self.language_path = re.search(r'/(fr|en)-(ca|us)/', self.start_url)
@@ -139,6 +228,22 @@ class WebCrawler:
         # Create directories
         self.create_directories()
 
+        # Concurrent page fetching (disabled with Playwright, see fetch_many)
+        self.max_concurrency = CRAWLER_MAX_CONCURRENCY
+        self.fetch_pool = None if self.use_playwright else ThreadPoolExecutor(max_workers=self.max_concurrency)
+
+        # Raw HTML fetched in Phase 1 is kept on disk (gzip) and read back in Phase 2
+        self.cache_raw_html = CACHE_RAW_HTML
+        self.raw_html_dir = self.base_dir / 'raw_html'
+        if self.cache_raw_html:
+            self.raw_html_dir.mkdir(parents=True, exist_ok=True)
+
+        # Downloads run in the background so page discovery is never blocked on file transfers
+        self.download_pool = ThreadPoolExecutor(max_workers=self.max_concurrency)
+        self.download_futures = set()
+        self.scheduled_downloads = set()
+        self.lock = threading.Lock()
+
         # Playwright (optional)
         self.playwright = None
         self.browser = None
@@ -160,10 +265,19 @@ class WebCrawler:
             status_forcelist=[429, 500, 502, 503, 504],
             allowed_methods=["HEAD", "GET", "OPTIONS"]
         )
-        adapter = HTTPAdapter(max_retries=retry_strategy)
+        # Keep enough pooled connections per host for the concurrent fetches and downloads
+        adapter = HTTPAdapter(
+            max_retries=retry_strategy,
+            pool_connections=32,
+            pool_maxsize=CRAWLER_POOL_MAXSIZE,
+            pool_block=False
+        )
         session.mount("http://", adapter)
         session.mount("https://", adapter)
-        session.verify = False
+        # Certificates are verified unless crawler_params.verify_ssl is explicitly turned off
+        session.verify = VERIFY_SSL
+        if not VERIFY_SSL:
+            urllib3.disable_warnings(InsecureRequestWarning)
         session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64)'
         })
@@ -174,6 +288,10 @@ class WebCrawler:
         for dir_name in directories:
             (self.base_dir / dir_name).mkdir(parents=True, exist_ok=True)
 
+    def page_url(self, key: str) -> str:
+        # URL to fetch for a visited_pages key (only stored when it differs from the key)
+        return self.page_urls.get(key, key)
+
     def should_exclude(self, url: str) -> bool:
         return any(excluded in url for excluded in EXCLUDED_PATHS)
 
@@ -183,11 +301,12 @@ class WebCrawler:
         return self.language_pattern in url
 
     def is_downloadable_file(self, url: str) -> bool:
-        path = urlparse(url).path.lower()
-        if not self.all_downloadable_exts:
+        return self.is_downloadable_path(urlsplit(url).path)
+
+    def is_downloadable_path(self, path: str) -> bool:
+        if self.downloadable_pattern is None:
             return False
-        pattern = re.compile(r'\.(' + '|'.join(ext.strip('.') for ext in self.all_downloadable_exts) + r')(\.[a-z0-9]+)?$', re.IGNORECASE)
-        return bool(pattern.search(path))
+        return bool(self.downloadable_pattern.search(path.lower()))
 
     def head_or_get(self, url: str) -> Optional[requests.Response]:
         try:
@@ -209,8 +328,7 @@ class WebCrawler:
 
         for file_type, extensions in self.downloadable_extensions.items():
             for ext in extensions:
-                pattern = re.compile(re.escape(ext) + r'(\.[a-z0-9]+)?$', re.IGNORECASE)
-                if pattern.search(path):
+                if self.extension_patterns[ext].search(path):
                     return file_type, self.content_type_mapping.get(file_type, {}).get(content_type, ext)
 
         for file_type, mapping in self.content_type_mapping.items():
@@ -220,9 +338,9 @@ class WebCrawler:
         return None, None
 
     def sanitize_filename(self, url: str, extension: str) -> str:
-        url_hash = hashlib.md5(url.encode()).hexdigest()[:8]
+        url_hash = url_digest(url)
         filename = url.split('/')[-1] or 'index'
-        filename = re.sub(r'[^\w\-_.]', '_', filename)
+        filename = UNSAFE_FILENAME_CHARS_RE.sub('_', filename)
         name = Path(filename).stem
         if not extension:
             extension = '.txt'
@@ -233,51 +351,86 @@ class WebCrawler:
         response = self.head_or_get(url)
         if not response or response.status_code != 200:
             self.logger.warning(f"Failed to retrieve file at {url}")
-            event_manager.emit('log', {'level': 'warning', 'message': f"Failed to retrieve file at {url}"})
             return False
 
         file_type_detected, extension = self.get_file_type_and_extension(url, response)
         if not file_type_detected:
             self.logger.warning(f"Could not determine file type for: {url}")
-            event_manager.emit('log', {'level': 'warning', 'message': f"Could not determine file type for: {url}"})
             return False
 
         if file_type_detected not in self.downloadable_extensions:
             self.logger.info(f"File type {file_type_detected} not enabled for download.")
-            event_manager.emit('log', {'level': 'info', 'message': f"File type {file_type_detected} not enabled for download."})
             return False
 
         self.logger.info(f"Attempting to download {file_type_detected} from: {url}")
-        event_manager.emit('log', {'level': 'info', 'message': f"Attempting to download {file_type_detected} from: {url}"})
 
         filename = self.sanitize_filename(url, extension)
         save_path = self.base_dir / file_type_detected / filename
 
         if save_path.exists():
             self.logger.info(f"File already downloaded, skipping: {filename}")
-            event_manager.emit('log', {'level': 'info', 'message': f"File already downloaded, skipping: {filename}"})
             return False
 
+        part_path = save_path.with_suffix(save_path.suffix + '.part')
         try:
             if response.request.method == 'HEAD':
                 response = self.session.get(url, stream=True, timeout=20)
 
-            with open(save_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
-
-            self.stats[f'{file_type_detected}_downloaded'] += 1
-            self.downloaded_files.add(url)
+            # Copy the raw stream in 1 MiB blocks (decompressing any Content-Encoding) into a
+            # .part file, hashing as we go so the same file served under several URLs is kept once
+            response.raw.decode_content = True
+            content_hash = hashlib.sha256()
+            with open(part_path, 'wb', buffering=1 << 20) as f:
+                while True:
+                    chunk = response.raw.read(1 << 20)
+                    if not chunk:
+                        break
+                    content_hash.update(chunk)
+                    f.write(chunk)
+            digest = content_hash.hexdigest()
+
+            with self.lock:
+                duplicate = digest in self.content_hashes
+                if duplicate:
+                    self.stats['duplicates_skipped'] += 1
+                else:
+                    self.content_hashes.add(digest)
+                    self.stats[f'{file_type_detected}_downloaded'] += 1
+                self.downloaded_files.add(url)
+
+            if duplicate:
+                os.remove(part_path)
+                self.logger.info(f"Duplicate content, skipping: {url}")
+                return False
+            os.replace(part_path, save_path)
+            if self.output_queue is not None:
+                self.output_queue.put(save_path)
             self.logger.info(f"Successfully downloaded {file_type_detected}: {filename}")
-            event_manager.emit('log', {'level': 'info', 'message': f"Successfully downloaded {file_type_detected}: {filename}"})
             event_manager.emit('download', {'file_type': file_type_detected, 'filename': filename})
             return True
         except Exception as e:
             self.logger.error(f"Error downloading {url}: {str(e)}")
-            event_manager.emit('log', {'level': 'error', 'message': f"Error downloading {url}: {str(e)}"})
+            # A transfer that failed midway must not leave its partial file behind
+            try:
+                os.remove(part_path)
+            except FileNotFoundError:
+                pass
             return False
 
+    def schedule_download(self, url: str):
+        if url in self.scheduled_downloads:
+            return
+        self.scheduled_downloads.add(url)
+        self.download_futures.add(self.download_pool.submit(self.download_file, url))
+
+    def wait_for_downloads(self):
+        for future in as_completed(self.download_futures):
+            try:
+                future.result()
+            except Exception as e:
+                self.logger.error(f"Error in download worker: {str(e)}")
+        self.download_futures.clear()
+
     def fetch_page_content(self, url: str) -> Optional[str]:
         if self.use_playwright and self.page:
             try:
@@ -286,7 +439,6 @@ class WebCrawler:
                 return self.page.content()
             except Exception as e:
                 self.logger.error(f"Playwright failed to fetch {url}: {str(e)}")
-                event_manager.emit('log', {'level': 'error', 'message': f"Playwright failed to fetch {url}: {str(e)}"})
                 return None
         else:
             try:
@@ -295,149 +447,203 @@ class WebCrawler:
                     return response.text
                 else:
                     self.logger.warning(f"Failed to fetch {url}, status code: {response.status_code}")
-                    event_manager.emit('log', {'level': 'warning', 'message': f"Failed to fetch {url}, status code: {response.status_code}"})
                     return None
             except Exception as e:
                 self.logger.error(f"Requests failed to fetch {url}: {str(e)}")
-                event_manager.emit('log', {'level': 'error', 'message': f"Requests failed to fetch {url}: {str(e)}"})
                 return None
 
-    def convert_links_to_absolute(self, soup: BeautifulSoup, base_url: str) -> BeautifulSoup:
-        for tag in soup.find_all(['a', 'embed', 'iframe', 'object'], href=True):
-            attr = 'href' if tag.name == 'a' else 'src'
-            href = tag.get(attr)
-            if href:
-                absolute_url = urljoin(base_url, href)
-                tag[attr] = absolute_url
-        return soup
-
-    def clean_text(self, text: str) -> str:
-        if not text:
-            return ""
-        text = re.sub(r'[\x00-\x1F\x7F-\x9F]', '', text)
-        text = re.sub(r'[ \t]+', ' ', text)
-        text = re.sub(r'\n\s*\n', '\n\n', text)
-        return text.strip()
+    def raw_html_path(self, url: str) -> Path:
+        return self.raw_html_dir / f"{hashlib.sha1(url.encode()).hexdigest()}.html.gz"
+
+    def fetch_and_cache_page(self, url: str) -> Optional[str]:
+        page_content = self.fetch_page_content(url)
+        if page_content is not None and self.cache_raw_html:
+            try:
+                self.raw_html_path(url).write_bytes(gzip.compress(page_content.encode('utf-8')))
+            except Exception as e:
+                self.logger.warning(f"Unable to cache raw HTML for {url}: {str(e)}")
+        return page_content
+
+    def load_page(self, url: str) -> Optional[str]:
+        if self.cache_raw_html:
+            raw_html_path = self.raw_html_path(url)
+            if raw_html_path.exists():
+                try:
+                    return gzip.decompress(raw_html_path.read_bytes()).decode('utf-8')
+                except Exception as e:
+                    self.logger.warning(f"Unreadable raw HTML cache for {url}, fetching again: {str(e)}")
+        return self.fetch_page_content(url)
+
+    def clear_raw_html_cache(self):
+        # The cache only bridges Phase 1 and Phase 2 (or a resumed Phase 2), so it is
+        # removed once content extraction has completed
+        if self.cache_raw_html and self.raw_html_dir.exists():
+            shutil.rmtree(self.raw_html_dir, ignore_errors=True)
+            self.logger.info(f"Raw HTML cache removed: {self.raw_html_dir}")
+
+    def fetch_many(self, urls: List[str], fetch):
+        # Playwright's sync API is bound to the thread that started it, so it fetches serially
+        if self.fetch_pool is None:
+            return map(fetch, urls)
+        return self.fetch_pool.map(fetch, urls)
 
     def extract_urls(self, start_url: str):
-        queue = deque([(start_url, 0)])
-        self.visited_pages.add(start_url)
+        # Level-synchronous BFS: all pages of a frontier level are fetched concurrently,
+        # then parsed in order as their responses arrive.
+        # Pages are deduplicated on their canonical key (see utils.url_utils), but fetched and
+        # used as the base for relative links under their original URL. Keys are interned so
+        # visited_pages, site_map keys and site_map values share one string object per URL.
+        start_url = urldefrag(start_url)[0]
+        start_key = sys.intern(canonicalize_url(start_url))
+        frontier = [(start_url, start_key, 0)]
+        self.visited_pages.add(start_key)
+        if start_url != start_key:
+            self.page_urls[start_key] = start_url
         crawled_count = 0
+        limit_reached = False
 
-        while queue:
-            current_url, depth = queue.popleft()
-
-            if self.max_urls is not None and crawled_count >= self.max_urls:
-                self.logger.info(f"Max URLs limit reached ({self.max_urls}), stopping URL extraction.")
-                event_manager.emit('log', {'level': 'info', 'message': f"Max URLs limit reached ({self.max_urls}), stopping URL extraction."})
-                break
-
-            if self.max_urls is None and depth > self.max_depth:
-                continue
-
-            if self.should_exclude(current_url):
-                self.logger.info(f"Excluded URL: {current_url}")
-                event_manager.emit('log', {'level': 'info', 'message': f"Excluded URL: {current_url}"})
-                continue
+        while frontier and not limit_reached:
+            to_fetch = []
+            for current_url, current_key, depth in frontier:
+                if self.max_urls is not None and crawled_count >= self.max_urls:
+                    self.logger.info(f"Max URLs limit reached ({self.max_urls}), stopping URL extraction.")
+                    limit_reached = True
+                    break
 
-            self.logger.info(f"Extracting URLs from: {current_url} (depth: {depth})")
-            event_manager.emit('log', {'level': 'info', 'message': f"Extracting URLs from: {current_url} (depth: {depth})"})
-            crawled_count += 1
+                if self.max_urls is None and depth > self.max_depth:
+                    continue
 
-            if self.is_downloadable_file(current_url):
-                self.download_file(current_url)
-                continue
+                if self.should_exclude(current_url):
+                    self.logger.info(f"Excluded URL: {current_url}")
+                    continue
 
-            page_content = self.fetch_page_content(current_url)
-            if page_content is None:
-                self.logger.warning(f"Unable to fetch content for: {current_url}")
-                event_manager.emit('log', {'level': 'warning', 'message': f"Unable to fetch content for: {current_url}"})
-                continue
+                self.logger.info(f"Extracting URLs from: {current_url} (depth: {depth})")
+                crawled_count += 1
 
-            soup = BeautifulSoup(page_content, 'html.parser')
-            child_links = set()
-            for tag in soup.find_all(['a', 'link', 'embed', 'iframe', 'object'], href=True):
-                href = tag.get('href') or tag.get('src')
-                if not href:
+                if self.is_downloadable_file(current_url):
+                    self.schedule_download(current_url)
                     continue
-                absolute_url = urljoin(current_url, href)
-                parsed_url = urlparse(absolute_url)
 
-                if self.is_downloadable_file(absolute_url):
-                    self.download_file(absolute_url)
+                to_fetch.append((current_url, current_key, depth))
+
+            next_frontier = []
+            page_contents = self.fetch_many([url for url, _, _ in to_fetch], self.fetch_and_cache_page)
+            for (current_url, current_key, depth), page_content in zip(to_fetch, page_contents):
+                if page_content is None:
+                    self.logger.warning(f"Unable to fetch content for: {current_url}")
                     continue
 
-                if (self.domain in parsed_url.netloc
-                        and self.is_same_language(absolute_url)
-                        and not absolute_url.endswith(('#', 'javascript:void(0)', 'javascript:;'))
-                        and not self.should_exclude(absolute_url)):
-                    child_links.add(absolute_url)
-                    if absolute_url not in self.visited_pages:
-                        if self.max_urls is None or crawled_count < self.max_urls:
-                            if self.max_urls is None and depth + 1 > self.max_depth:
-                                continue
-                            queue.append((absolute_url, depth + 1))
-                            self.visited_pages.add(absolute_url)
+                # Only links are needed here, so the page is parsed with selectolax (C parser)
+                # rather than building a full BeautifulSoup tree
+                tree = HTMLParser(page_content)
+                child_links = set()
+                # Whether children of this page may join the next level depends only on
+                # the page's depth and the URL budget, so it is decided once per page
+                next_depth = depth + 1
+                can_enqueue = (self.max_urls is None and next_depth <= self.max_depth) or (
+                    self.max_urls is not None and crawled_count < self.max_urls)
+                for node in tree.css('a[href], link[href], embed[href], iframe[href], object[href]'):
+                    href = node.attributes.get('href')
+                    if not href:
+                        continue
+                    absolute_url = urljoin(current_url, href)
+                    if absolute_url.endswith(('#', 'javascript:void(0)', 'javascript:;')):
+                        continue
+                    # Split once and reuse the parts for every check below, including the dedup key
+                    split_url = urlsplit(absolute_url)
+                    if split_url.fragment:
+                        split_url = split_url._replace(fragment='')
+                        absolute_url = split_url.geturl()
+
+                    if self.is_downloadable_path(split_url.path):
+                        self.schedule_download(absolute_url)
+                        continue
+
+                    netloc = canonical_netloc(split_url)
+                    if (self.domain in netloc
+                            and self.is_same_language(absolute_url)
+                            and not self.should_exclude(absolute_url)):
+                        key = sys.intern(canonicalize_split(split_url, netloc))
+                        child_links.add(key)
+                        # Test-and-insert: a URL linked from several pages of the same level is queued once
+                        if can_enqueue and key not in self.visited_pages:
+                            self.visited_pages.add(key)
+                            if absolute_url != key:
+                                self.page_urls[key] = absolute_url
+                            next_frontier.append((absolute_url, key, next_depth))
                             event_manager.emit('progress', {'type': 'new_url', 'url': absolute_url})
 
-            self.site_map[current_url].update(child_links)
-            event_manager.emit('progress', {'type': 'page_crawled', 'url': current_url})
-
-    def extract_content(self, url: str):
-        if self.is_downloadable_file(url):
-            self.logger.debug(f"Skipping content extraction for downloadable file: {url}")
-            event_manager.emit('log', {'level': 'debug', 'message': f"Skipping content extraction for downloadable file: {url}"})
-            return
-
-        page_content = self.fetch_page_content(url)
-        if page_content is None:
-            self.logger.warning(f"Unable to fetch content for: {url}")
-            event_manager.emit('log', {'level': 'warning', 'message': f"Unable to fetch content for: {url}"})
-            return
-
-        soup = BeautifulSoup(page_content, 'html.parser')
-        for element in soup.find_all(['nav', 'header', 'footer', 'script', 'style', 'aside', 'iframe']):
-            element.decompose()
+                self.site_map[current_key].update(child_links)
+                event_manager.emit('progress', {'type': 'page_crawled', 'url': current_url})
 
-        main_content = (soup.find('main') or soup.find('article') or 
-                        soup.find('div', class_='content') or soup.find('div', id='content'))
+            frontier = next_frontier
 
-        if not main_content:
+    def save_content(self, url: str, content: Optional[str], link_urls: List[str]):
+        if content is None:
             self.logger.warning(f"No main content found for: {url}")
-            event_manager.emit('log', {'level': 'warning', 'message': f"No main content found for: {url}"})
             return
 
-        self.convert_links_to_absolute(main_content, url)
-        markdown_content = self.html_converter.handle(str(main_content))
-
-        title = soup.find('h1')
-        content_parts = []
-        if title:
-            content_parts.append(f"# {title.get_text().strip()}")
-        content_parts.append(f"**Source:** {url}")
-        content_parts.append(markdown_content)
-
-        content = self.clean_text('\n\n'.join(content_parts))
+        for file_url in link_urls:
+            if self.is_downloadable_file(file_url) and file_url not in self.downloaded_files:
+                self.schedule_download(file_url)
 
         if content:
             filename = self.sanitize_filename(url, '.txt')
             save_path = self.base_dir / 'content' / filename
             with open(save_path, 'w', encoding='utf-8') as f:
                 f.write(content)
-            self.stats['pages_processed'] += 1
+            with self.lock:
+                self.stats['pages_processed'] += 1
             self.logger.info(f"Content successfully saved to: {filename}")
-            event_manager.emit('log', {'level': 'info', 'message': f"Content successfully saved to: {filename}"})
             event_manager.emit('progress', {'type': 'content_extracted', 'url': url, 'filename': filename})
         else:
             self.logger.warning(f"No meaningful content found for: {url}")
-            event_manager.emit('log', {'level': 'warning', 'message': f"No meaningful content found for: {url}"})
 
-        for tag in main_content.find_all(['a', 'embed', 'iframe', 'object'], href=True):
-            href = tag.get('href') or tag.get('src')
-            if href:
-                file_url = urljoin(url, href)
-                if self.is_downloadable_file(file_url) and file_url not in self.downloaded_files:
-                    self.download_file(file_url)
+    def extract_all_content(self):
+        urls = []
+        for key in self.visited_pages:
+            url = self.page_url(key)
+            if self.is_downloadable_file(url):
+                self.logger.debug(f"Skipping content extraction for downloadable file: {url}")
+                continue
+            urls.append(url)
+
+        if not urls:
+            return
+
+        # Pages are fetched concurrently in batches and each one is handed to the parse pool
+        # as soon as it arrives; parsing and markdown conversion run on every core, while
+        # file writes and download scheduling stay in this process. The next batch is already
+        # being fetched while the current batch's results are collected and saved.
+        # Workers start from a fresh interpreter (forkserver, or the platform default where it
+        # is unavailable, e.g. spawn on Windows) rather than a fork of this multi-threaded process;
+        # they re-import the main module, which is why main.py starts no threads at import time.
+        batch_size = self.max_concurrency * 4
+        start_method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else None
+        parse_context = multiprocessing.get_context(start_method)
+        with ProcessPoolExecutor(max_workers=os.cpu_count(), mp_context=parse_context) as parse_pool:
+            parse_futures = []
+            for start in range(0, len(urls), batch_size):
+                batch = urls[start:start + batch_size]
+                page_contents = self.fetch_many(batch, self.load_page)
+                self.save_parsed_pages(parse_futures)
+                parse_futures = []
+                for i, (url, page_content) in enumerate(zip(batch, page_contents), start + 1):
+                    self.logger.info(f"Processing {i}/{len(urls)}: {url}")
+                    if page_content is None:
+                        self.logger.warning(f"Unable to fetch content for: {url}")
+                        continue
+                    parse_futures.append((url, parse_pool.submit(extract_page, url, page_content)))
+            self.save_parsed_pages(parse_futures)
+
+    def save_parsed_pages(self, parse_futures):
+        for url, future in parse_futures:
+            try:
+                content, link_urls = future.result()
+            except Exception as e:
+                self.logger.error(f"Error extracting content from {url}: {str(e)}")
+                continue
+            self.save_content(url, content, link_urls)
 
     def load_downloaded_files(self):
         downloaded_files_path = self.base_dir / 'logs' / 'downloaded_files.txt'
@@ -446,10 +652,8 @@ class WebCrawler:
                 for line in f:
                     self.downloaded_files.add(line.strip())
             self.logger.info(f"Loaded {len(self.downloaded_files)} downloaded files.")
-            event_manager.emit('log', {'level': 'info', 'message': f"Loaded {len(self.downloaded_files)} downloaded files."})
         else:
             self.logger.info("No downloaded files tracking found, starting fresh.")
-            event_manager.emit('log', {'level': 'info', 'message': "No downloaded files tracking found, starting fresh."})
 
     def save_downloaded_files(self):
         downloaded_files_path = self.base_dir / 'logs' / 'downloaded_files.txt'
@@ -458,10 +662,8 @@ class WebCrawler:
                 for url in sorted(self.downloaded_files):
                     f.write(url + '\n')
             self.logger.info(f"Saved {len(self.downloaded_files)} downloaded files.")
-            event_manager.emit('log', {'level': 'info', 'message': f"Saved {len(self.downloaded_files)} downloaded files."})
         except Exception as e:
             self.logger.error(f"Error saving downloaded files: {str(e)}")
-            event_manager.emit('log', {'level': 'error', 'message': f"Error saving downloaded files: {str(e)}"})
 
     def generate_report(self, duration: float, error: Optional[str] = None):
         report_data = {
@@ -475,61 +677,75 @@ class WebCrawler:
             "files_downloaded": {k: self.stats.get(f"{k}_downloaded", 0) for k in self.downloadable_extensions.keys()},
             "total_files_downloaded": sum(self.stats.get(f"{k}_downloaded", 0) for k in self.downloadable_extensions.keys()),
             "status": "Completed with errors" if error else "Completed successfully",
-            "error": error,
-            "visited_pages": sorted(self.visited_pages),
-            "downloaded_files": sorted(self.downloaded_files)
+            "error": error
         }
 
         json_report_path = self.base_dir / 'crawler_report.json'
+        tmp_path = json_report_path.with_suffix('.json.tmp')
         try:
-            with open(json_report_path, 'w', encoding='utf-8') as f:
-                json.dump(report_data, f, indent=4, ensure_ascii=False)
+            # The summary is serialized as one object; the two URL lists, which dominate
+            # the report on large crawls, are streamed element by element into the same object
+            with open(tmp_path, 'wb', buffering=1 << 20) as f:
+                f.write(orjson.dumps(report_data)[:-1])
+                for key, urls in (("visited_pages", self.visited_pages), ("downloaded_files", self.downloaded_files)):
+                    f.write(b',' + orjson.dumps(key) + b':[')
+                    for i, url in enumerate(sorted(urls)):
+                        if i:
+                            f.write(b',')
+                        f.write(orjson.dumps(url))
+                    f.write(b']')
+                f.write(b'}')
+            os.replace(tmp_path, json_report_path)
             self.logger.info(f"Report generated successfully: {json_report_path}")
-            event_manager.emit('log', {'level': 'info', 'message': f"Report generated successfully: {json_report_path}"})
         except Exception as e:
             self.logger.error(f"Error generating report: {str(e)}")
-            event_manager.emit('log', {'level': 'error', 'message': f"Error generating report: {str(e)}"})
 
     def save_checkpoint(self):
         checkpoint_data = {
             "visited_pages": list(self.visited_pages),
             "downloaded_files": list(self.downloaded_files),
+            "content_hashes": list(self.content_hashes),
             "site_map": {k: list(v) for k, v in self.site_map.items()},
+            "page_urls": self.page_urls,
             "stats": dict(self.stats)
         }
+        # Serialized in one pass to bytes, then swapped in atomically so an interrupted
+        # save never leaves a truncated checkpoint behind
+        tmp_file = CHECKPOINT_FILE + '.tmp'
         try:
-            with open(CHECKPOINT_FILE, 'w', encoding='utf-8') as f:
-                json.dump(checkpoint_data, f, ensure_ascii=False, indent=4)
+            with open(tmp_file, 'wb') as f:
+                f.write(orjson.dumps(checkpoint_data))
+            os.replace(tmp_file, CHECKPOINT_FILE)
             self.logger.info(f"Checkpoint saved: {CHECKPOINT_FILE}")
-            event_manager.emit('log', {'level': 'info', 'message': f"Checkpoint saved: {CHECKPOINT_FILE}"})
         except Exception as e:
             self.logger.error(f"Error saving checkpoint: {str(e)}")
-            event_manager.emit('log', {'level': 'error', 'message': f"Error saving checkpoint: {str(e)}"})
 
     def load_checkpoint(self):
         if os.path.exists(CHECKPOINT_FILE):
             try:
-                with open(CHECKPOINT_FILE, 'r', encoding='utf-8') as f:
-                    checkpoint_data = json.load(f)
-                self.visited_pages = set(checkpoint_data.get("visited_pages", []))
-                self.downloaded_files = set(checkpoint_data.get("downloaded_files", []))
-                self.site_map = {k: set(v) for k, v in checkpoint_data.get("site_map", {}).items()}
+                with open(CHECKPOINT_FILE, 'rb') as f:
+                    checkpoint_data = orjson.loads(f.read())
+                self.visited_pages = set(map(sys.intern, checkpoint_data.get("visited_pages", [])))
+                self.downloaded_files = set(map(sys.intern, checkpoint_data.get("downloaded_files", [])))
+                self.content_hashes = set(checkpoint_data.get("content_hashes", []))
+                self.page_urls = {
+                    sys.intern(k): v for k, v in checkpoint_data.get("page_urls", {}).items()
+                }
+                self.site_map = {
+                    sys.intern(k): set(map(sys.intern, v))
+                    for k, v in checkpoint_data.get("site_map", {}).items()
+                }
                 self.stats = defaultdict(int, checkpoint_data.get("stats", {}))
                 self.logger.info(f"Checkpoint loaded: {CHECKPOINT_FILE}")
-                event_manager.emit('log', {'level': 'info', 'message': f"Checkpoint loaded: {CHECKPOINT_FILE}"})
             except Exception as e:
                 self.logger.error(f"Error loading checkpoint: {str(e)}")
-                event_manager.emit('log', {'level': 'error', 'message': f"Error loading checkpoint: {str(e)}"})
 
     def crawl(self):
         start_time = time.time()
         self.logger.info(f"Starting crawl of {self.start_url}")
-        event_manager.emit('log', {'level': 'info', 'message': f"Starting crawl of {self.start_url}"})
         self.logger.info(f"Max depth: {self.max_depth}")
-        event_manager.emit('log', {'level': 'info', 'message': f"Max depth: {self.max_depth}"})
         if self.max_urls is not None:
             self.logger.info(f"Max URLs to crawl: {self.max_urls}")
-            event_manager.emit('log', {'level': 'info', 'message': f"Max URLs to crawl: {self.max_urls}"})
 
         if not self.visited_pages:
             self.load_downloaded_files()
@@ -538,36 +754,37 @@ class WebCrawler:
         try:
             # Phase 1: URL Extraction
             self.logger.info("Phase 1: Starting URL extraction")
-            event_manager.emit('log', {'level': 'info', 'message': "Phase 1: Starting URL extraction"})
             if not self.visited_pages:
                 self.extract_urls(self.start_url)
+                self.wait_for_downloads()
                 self.save_checkpoint()  # Save after URL extraction
             else:
                 self.logger.info("Checkpoint found, skipping URL extraction phase.")
-                event_manager.emit('log', {'level': 'info', 'message': "Checkpoint found, skipping URL extraction phase."})
 
             # Phase 2: Content Extraction
             self.logger.info("Phase 2: Starting content extraction")
-            event_manager.emit('log', {'level': 'info', 'message': "Phase 2: Starting content extraction"})
-            for i, url in enumerate(self.visited_pages, 1):
-                self.logger.info(f"Processing {i}/{len(self.visited_pages)}: {url}")
-                event_manager.emit('log', {'level': 'info', 'message': f"Processing {i}/{len(self.visited_pages)}: {url}"})
-                self.extract_content(url)
+            self.extract_all_content()
+            self.clear_raw_html_cache()
+            self.wait_for_downloads()
             self.logger.info("Phase 2: Content extraction completed")
-            event_manager.emit('log', {'level': 'info', 'message': "Phase 2: Content extraction completed"})
 
             self.save_checkpoint()
 
         except Exception as e:
             error = str(e)
             self.logger.error(f"Critical error during crawl: {str(e)}")
-            event_manager.emit('log', {'level': 'error', 'message': f"Critical error during crawl: {str(e)}"})
+
+        self.wait_for_downloads()
+        self.download_pool.shutdown()
 
         end_time = time.time()
         duration = end_time - start_time
         self.generate_report(duration, error=error)
         self.save_downloaded_files()
 
+        if self.fetch_pool is not None:
+            self.fetch_pool.shutdown()
+
         if self.use_playwright:
             self.page.close()
             self.browser.close()
@@ -28,6 +28,7 @@ class EmbeddingProcessor:
 
         self.all_embeddings = []
         self.all_metadata = []
+        self.embedded_files = set()
         
         self.llm_provider = llm_provider.lower()
         self.embedding_provider = embedding_provider.lower()
@@ -40,6 +41,8 @@ class EmbeddingProcessor:
             } for key in self.openai_api_keys
         ])
         self.lock = threading.Lock()
+        # Pool partagé par tous les fichiers : les chunks de chaque fichier sont répartis sur les mêmes workers
+        self.chunk_executor = ThreadPoolExecutor(max_workers=20)
 
         self.anthropic_api_key = os.getenv("ANTHROPIC_API_KEY", "")
         self.mistral_api_key = os.getenv("MISTRAL_API_KEY", "")
@@ -258,6 +261,39 @@ class EmbeddingProcessor:
         ]
         return chunk_infos
 
+    def add_result(self, embedding, metadata):
+        with self.lock:
+            self.all_embeddings.append(embedding)
+            self.all_metadata.append(metadata)
+        event_manager.emit('embedding_processed', {'filename': metadata['filename'], 'chunk_id': metadata['chunk_id']})
+
+    def embed_file(self, txt_file_path):
+        # Point d'entrée unitaire utilisé par le pipeline en flux : retourne le fichier traité.
+        # Un fichier reçu deux fois (copie sur disque puis version fraîche) : la dernière
+        # version traitée remplace les résultats de la précédente
+        chunk_infos = self.process_file(txt_file_path)
+        results = [
+            (embedding, metadata)
+            for embedding, metadata in self.chunk_executor.map(self.process_chunk, chunk_infos)
+            if embedding and metadata
+        ]
+        with self.lock:
+            if txt_file_path.name in self.embedded_files:
+                kept = [
+                    (embedding, metadata)
+                    for embedding, metadata in zip(self.all_embeddings, self.all_metadata)
+                    if metadata['filename'] != txt_file_path.name
+                ]
+                self.all_embeddings = [embedding for embedding, _ in kept]
+                self.all_metadata = [metadata for _, metadata in kept]
+            self.embedded_files.add(txt_file_path.name)
+            self.all_embeddings.extend(embedding for embedding, _ in results)
+            self.all_metadata.extend(metadata for _, metadata in results)
+        event_manager.emit_many('embedding_processed', [
+            {'filename': metadata['filename'], 'chunk_id': metadata['chunk_id']} for _, metadata in results
+        ])
+        return txt_file_path
+
     def process_all_files(self):
         txt_files = list(self.input_dir.glob('*.txt'))
         total_files = len(txt_files)
@@ -266,22 +302,22 @@ class EmbeddingProcessor:
         self.all_embeddings = []
         self.all_metadata = []
 
-        with ThreadPoolExecutor(max_workers=20) as executor:
-            futures = []
-            for i, txt_file_path in enumerate(txt_files, 1):
-                self.logger.info(f"Fichier {i}/{total_files} : {txt_file_path.name}")
-                event_manager.emit('log', {'level': 'info', 'message': f"Fichier {i}/{total_files} : {txt_file_path.name}"})
-                chunk_infos = self.process_file(txt_file_path)
-                for chunk_info in chunk_infos:
-                    futures.append(executor.submit(self.process_chunk, chunk_info))
-
-            for future in as_completed(futures):
-                embedding, metadata = future.result()
-                if embedding and metadata:
-                    self.all_embeddings.append(embedding)
-                    self.all_metadata.append(metadata)
-                    event_manager.emit('embedding_processed', {'filename': metadata['filename'], 'chunk_id': metadata['chunk_id']})
+        futures = []
+        for i, txt_file_path in enumerate(txt_files, 1):
+            self.logger.info(f"Fichier {i}/{total_files} : {txt_file_path.name}")
+            event_manager.emit('log', {'level': 'info', 'message': f"Fichier {i}/{total_files} : {txt_file_path.name}"})
+            chunk_infos = self.process_file(txt_file_path)
+            for chunk_info in chunk_infos:
+                futures.append(self.chunk_executor.submit(self.process_chunk, chunk_info))
+
+        for future in as_completed(futures):
+            embedding, metadata = future.result()
+            if embedding and metadata:
+                self.add_result(embedding, metadata)
+
+        self.save_results()
 
+    def save_results(self):
         if self.all_embeddings:
             chunks_json_path = self.output_dir / "chunks.json"
             try:
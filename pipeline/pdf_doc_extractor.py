@@ -313,8 +313,7 @@ class PDFExtractor:
         final_content = "\n\n".join(processed_contents)
         output_file_name = self.output_dir / f"{document_name}.txt"
         try:
-            with open(output_file_name, 'w', encoding='utf-8') as f:
-                f.write(f"Document ID : {document_name}\n\n{final_content}")
+            self.write_text(output_file_name, f"Document ID : {document_name}\n\n{final_content}")
             self.logger.info(f"Fichier créé : {output_file_name}")
             event_manager.emit('log', {'level': 'info', 'message': f"Fichier créé : {output_file_name}"})
             event_manager.emit('content_extracted', {'filename': output_file_name.name})
@@ -322,7 +321,7 @@ class PDFExtractor:
             self.logger.error(f"Erreur lors de la sauvegarde de {pdf_path} : {str(e)}")
             event_manager.emit('log', {'level': 'error', 'message': f"Erreur lors de la sauvegarde de {pdf_path} : {str(e)}"})
             return False
-        return True
+        return output_file_name
 
     def convert_doc_to_txt(self, input_path, output_path):
         try:
@@ -331,8 +330,7 @@ class PDFExtractor:
             result = subprocess.run(['antiword', input_path], capture_output=True, text=True)
             if result.returncode != 0:
                 raise Exception(f"antiword a échoué : {result.stderr}")
-            with open(output_file, 'w', encoding='utf-8') as f:
-                f.write(result.stdout)
+            self.write_text(output_file, result.stdout)
             self.logger.info(f"Converti (DOC) : {input_path}")
             event_manager.emit('log', {'level': 'info', 'message': f"Converti (DOC) : {input_path}"})
             return output_file
@@ -347,8 +345,7 @@ class PDFExtractor:
             text = '\n'.join([p.text for p in doc.paragraphs])
             base_name = os.path.splitext(os.path.basename(input_path))[0]
             output_file = os.path.join(output_path, f"{base_name}.txt")
-            with open(output_file, 'w', encoding='utf-8') as f:
-                f.write(text)
+            self.write_text(output_file, text)
             self.logger.info(f"Converti (DOCX) : {input_path}")
             event_manager.emit('log', {'level': 'info', 'message': f"Converti (DOCX) : {input_path}"})
             return output_file
@@ -399,8 +396,7 @@ class PDFExtractor:
         
         output_file_name = self.output_dir / f"{document_name}_rewritten.txt"
         try:
-            with open(output_file_name, 'w', encoding='utf-8') as f:
-                f.write(f"Document ID : {document_name}\n\n{processed_content}")
+            self.write_text(output_file_name, f"Document ID : {document_name}\n\n{processed_content}")
             self.logger.info(f"Fichier créé : {output_file_name}")
             event_manager.emit('log', {'level': 'info', 'message': f"Fichier créé : {output_file_name}"})
             event_manager.emit('content_rewritten', {'filename': output_file_name.name})
@@ -408,7 +404,56 @@ class PDFExtractor:
             self.logger.error(f"Erreur lors de la sauvegarde de {doc_path} : {str(e)}")
             event_manager.emit('log', {'level': 'error', 'message': f"Erreur lors de la sauvegarde de {doc_path} : {str(e)}"})
             return False
-        return True
+        return output_file_name
+
+    def write_text(self, output_file, text):
+        # Écriture via un fichier temporaire puis os.replace : une étape aval qui lit le fichier
+        # en même temps voit l'ancienne ou la nouvelle version, jamais un fichier tronqué
+        tmp_file = f"{output_file}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_file, output_file)
+
+    def output_files(self, file_path):
+        # Fichiers texte écrits dans output_dir pour un document source (le premier est le résultat final)
+        document_name = file_path.stem
+        suffix = file_path.suffix.lower()
+        if suffix == '.pdf':
+            return [self.output_dir / f"{document_name}.txt"]
+        if suffix in ('.doc', '.docx'):
+            return [self.output_dir / f"{document_name}_rewritten.txt", self.output_dir / f"{document_name}.txt"]
+        return []
+
+    def is_up_to_date(self, file_path):
+        # Le texte extrait existe et est plus récent que le document source
+        output_files = self.output_files(file_path)
+        if not output_files:
+            return False
+        try:
+            return output_files[0].stat().st_mtime_ns >= file_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return False
+
+    def process_file(self, file_path):
+        # Point d'entrée unitaire utilisé par le pipeline en flux : retourne le fichier texte produit
+        if self.is_up_to_date(file_path):
+            self.logger.debug(f"Déjà extrait, ignoré : {file_path}")
+            return None
+        suffix = file_path.suffix.lower()
+        if suffix == '.pdf':
+            result = self.process_pdf(file_path)
+        elif suffix in ('.doc', '.docx'):
+            result = self.process_doc_file(file_path)
+        else:
+            self.logger.debug(f"Fichier ignoré (format non extrait) : {file_path}")
+            return None
+        # En cas d'échec, le texte d'une extraction précédente reste transmis aux étapes suivantes
+        previous_output = self.output_files(file_path)[0]
+        if not result and previous_output.exists():
+            self.logger.warning(f"Extraction échouée, texte précédent conservé : {previous_output}")
+            event_manager.emit('log', {'level': 'warning', 'message': f"Extraction échouée, texte précédent conservé : {previous_output}"})
+            return previous_output
+        return result
 
     def process_all_pdfs(self):
         pdf_files = list(self.input_dir.glob('*.pdf'))
@@ -0,0 +1,35 @@
+import unittest
+
+from utils.adaptive_semaphore import AdaptiveSemaphore
+
+
+class AdaptiveSemaphoreTest(unittest.TestCase):
+    def run_burst(self, semaphore, count, status_code):
+        for _ in range(count):
+            semaphore.acquire()
+        for _ in range(count):
+            semaphore.release()
+            semaphore.record(status_code)
+
+    def test_burst_of_429_halves_once(self):
+        semaphore = AdaptiveSemaphore(max_permits=64)
+        self.run_burst(semaphore, 64, 429)
+        self.assertEqual(semaphore.permits, 32)
+
+    def test_next_window_halves_again(self):
+        semaphore = AdaptiveSemaphore(max_permits=64)
+        self.run_burst(semaphore, 64, 429)
+        self.run_burst(semaphore, 32, 503)
+        self.assertEqual(semaphore.permits, 16)
+
+    def test_successes_add_permits_up_to_max(self):
+        semaphore = AdaptiveSemaphore(max_permits=4, initial_permits=3, increase_after=2)
+        self.run_burst(semaphore, 1, 200)
+        self.run_burst(semaphore, 1, 200)
+        self.assertEqual(semaphore.permits, 4)
+        self.run_burst(semaphore, 4, 200)
+        self.assertEqual(semaphore.permits, 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
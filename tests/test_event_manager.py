@@ -0,0 +1,34 @@
+import unittest
+from unittest import mock
+
+from utils.event_manager import EventManager
+
+
+class EventManagerTest(unittest.TestCase):
+    def test_full_queue_drops_and_counts(self):
+        manager = EventManager(maxsize=2)
+        for i in range(5):
+            manager.emit('log', {'message': str(i)})
+        self.assertEqual(len(manager.drain()), 2)
+        self.assertEqual(manager.take_dropped(), 3)
+        self.assertEqual(manager.take_dropped(), 0)
+
+    def test_crawl_completed_is_never_dropped(self):
+        manager = EventManager(maxsize=2)
+        manager.emit('log', {'message': 'a'})
+        manager.emit('crawl_completed', {'status': 'success'})
+        manager.emit('log', {'message': 'b'})
+        types = [event['type'] for event in manager.drain()]
+        self.assertIn('crawl_completed', types)
+        self.assertEqual(manager.take_dropped(), 1)
+
+    def test_crawl_completed_times_out_on_a_stuck_queue(self):
+        manager = EventManager(maxsize=1)
+        manager.emit('log', {'message': 'a'})
+        with mock.patch('utils.event_manager.GUARANTEED_PUT_TIMEOUT', 0.01):
+            manager.emit('crawl_completed', {'status': 'success'})
+        self.assertEqual(manager.take_dropped(), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
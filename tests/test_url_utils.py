@@ -0,0 +1,52 @@
+import unittest
+from urllib.parse import urljoin, urlsplit
+
+from utils.url_utils import canonicalize_url, canonicalize_split, canonical_netloc
+
+
+class CanonicalizeUrlTest(unittest.TestCase):
+    def test_trailing_slash_is_collapsed(self):
+        self.assertEqual(canonicalize_url('https://x.com/a/'), canonicalize_url('https://x.com/a'))
+
+    def test_root_keeps_its_slash(self):
+        self.assertEqual(canonicalize_url('https://x.com'), 'https://x.com/')
+        self.assertEqual(canonicalize_url('https://x.com/'), 'https://x.com/')
+
+    def test_query_parameters_are_sorted(self):
+        self.assertEqual(canonicalize_url('https://x.com/a?b=1&a=2'), 'https://x.com/a?a=2&b=1')
+        self.assertEqual(canonicalize_url('https://x.com/a?b=1&a=2'), canonicalize_url('https://x.com/a?a=2&b=1'))
+
+    def test_query_encoding_is_preserved(self):
+        self.assertEqual(canonicalize_url('https://x.com/a?print'), 'https://x.com/a?print')
+        self.assertEqual(canonicalize_url('https://x.com/a?q=a/b'), 'https://x.com/a?q=a/b')
+
+    def test_fragment_host_case_and_default_port(self):
+        self.assertEqual(canonicalize_url('HTTPS://X.com:443/A#frag'), 'https://x.com/A')
+        self.assertEqual(canonicalize_url('http://x.com:8080/'), 'http://x.com:8080/')
+
+    def test_non_http_urls_are_unchanged(self):
+        self.assertEqual(canonicalize_url('mailto:a@b.com'), 'mailto:a@b.com')
+
+    def test_key_is_not_a_base_for_relative_links(self):
+        # The original URL must stay the base: the key drops the trailing slash
+        page = 'https://your-example-site.com/fr-ca/'
+        self.assertEqual(urljoin(page, 'produits/a.html'), 'https://your-example-site.com/fr-ca/produits/a.html')
+        self.assertNotEqual(urljoin(canonicalize_url(page), 'produits/a.html'), urljoin(page, 'produits/a.html'))
+
+    def test_ipv6_host_keeps_its_brackets(self):
+        self.assertEqual(canonicalize_url('http://[::1]:8080/a/'), 'http://[::1]:8080/a')
+        self.assertEqual(canonicalize_url('https://[::1]:443/'), 'https://[::1]/')
+
+    def test_split_with_precomputed_netloc_matches_url(self):
+        parts = urlsplit('https://X.com:443/a/?b=1&a=2')
+        self.assertEqual(canonicalize_split(parts, canonical_netloc(parts)), canonicalize_url('https://X.com:443/a/?b=1&a=2'))
+
+
+class CanonicalNetlocTest(unittest.TestCase):
+    def test_host_case_and_ports(self):
+        self.assertEqual(canonical_netloc(urlsplit('https://Site.com:443/')), 'site.com')
+        self.assertEqual(canonical_netloc(urlsplit('https://Site.com:8443/')), 'site.com:8443')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+# utils/adaptive_semaphore.py
+import threading
+
+# Semaphore whose permits adapt to API responses (AIMD): rate limiting (429) and
+# server errors (5xx) halve the permits, every `increase_after` consecutive
+# successes add one permit back, up to `max_permits`.
+# Permits are cut at most once per window: the requests already in flight at the
+# time of a cut were sent at the old rate, so their 429/5xx responses are not
+# counted again. The window ends once that many further responses are recorded.
+class AdaptiveSemaphore:
+    def __init__(self, max_permits, initial_permits=None, increase_after=100):
+        self.max_permits = max_permits
+        self.permits = initial_permits if initial_permits is not None else max_permits
+        self.increase_after = increase_after
+        self.in_use = 0
+        self.consecutive_successes = 0
+        self.responses_before_next_cut = 0
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        with self.condition:
+            while self.in_use >= self.permits:
+                self.condition.wait()
+            self.in_use += 1
+
+    def release(self):
+        with self.condition:
+            self.in_use -= 1
+            self.condition.notify()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+    def record(self, status_code):
+        with self.condition:
+            in_cut_window = self.responses_before_next_cut > 0
+            if in_cut_window:
+                self.responses_before_next_cut -= 1
+            if status_code == 429 or status_code >= 500:
+                self.consecutive_successes = 0
+                if not in_cut_window:
+                    self.permits = max(1, self.permits // 2)
+                    self.responses_before_next_cut = self.in_use
+            elif 200 <= status_code < 300:
+                self.consecutive_successes += 1
+                if self.consecutive_successes >= self.increase_after and self.permits < self.max_permits:
+                    self.permits += 1
+                    self.consecutive_successes = 0
+                    self.condition.notify()
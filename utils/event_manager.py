@@ -1,19 +1,73 @@
 # utils/event_manager.py
 import threading
 import queue
+import logging
+
+# File bornée : si le tableau de bord ne suit pas, les événements en trop sont
+# abandonnés (et comptés) au lieu de bloquer les producteurs ou de saturer la mémoire.
+# Les événements ponctuels dont dépend le tableau de bord ne sont jamais abandonnés.
+GUARANTEED_EVENTS = {'crawl_completed'}
+# Attente maximale (secondes) pour ces événements si la file est pleine : au-delà, le
+# consommateur est considéré comme bloqué et l'événement est compté comme abandonné
+GUARANTEED_PUT_TIMEOUT = 30
 
 class EventManager:
-    def __init__(self):
-        self.queue = queue.Queue()
+    def __init__(self, maxsize=10000):
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.dropped = 0
+        self.dropped_lock = threading.Lock()
+
+    def put(self, event, timeout=None):
+        try:
+            if timeout is None:
+                self.queue.put_nowait(event)
+            else:
+                self.queue.put(event, timeout=timeout)
+        except queue.Full:
+            with self.dropped_lock:
+                self.dropped += 1
 
     def emit(self, event_type, data):
-        self.queue.put({'type': event_type, 'data': data})
+        event = {'type': event_type, 'data': data}
+        if event_type in GUARANTEED_EVENTS:
+            self.put(event, timeout=GUARANTEED_PUT_TIMEOUT)
+        else:
+            self.put(event)
+
+    def take_dropped(self):
+        # Nombre d'événements abandonnés depuis le dernier appel
+        with self.dropped_lock:
+            dropped, self.dropped = self.dropped, 0
+        return dropped
 
-    def get_event(self):
+    def emit_many(self, event_type, items):
+        # Un seul passage par la file pour un lot d'événements de même type
+        if items:
+            self.put({'type': event_type, 'data': list(items), 'batch': True})
+
+    def get_event(self, block=True, timeout=None):
         try:
-            return self.queue.get(timeout=1)
+            return self.queue.get(block=block, timeout=timeout)
         except queue.Empty:
             return None
 
+    def drain(self, max_events=128):
+        events = []
+        while len(events) < max_events:
+            try:
+                events.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return events
+
 # Singleton instance
 event_manager = EventManager()
+
+# Handler de logging qui relaie chaque enregistrement vers le tableau de bord,
+# ce qui évite de doubler chaque appel au logger d'un event_manager.emit('log', ...)
+class EventManagerHandler(logging.Handler):
+    def emit(self, record):
+        try:
+            event_manager.emit('log', {'level': record.levelname.lower(), 'message': record.getMessage()})
+        except Exception:
+            self.handleError(record)
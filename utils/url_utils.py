@@ -0,0 +1,41 @@
+# utils/url_utils.py
+from urllib.parse import urlsplit, urlunsplit, SplitResult
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+def canonical_netloc(parts: SplitResult) -> str:
+    # Lowercased host, default port removed; returns the netloc unchanged if the port is invalid
+    try:
+        port = parts.port
+    except ValueError:
+        return parts.netloc
+    host = (parts.hostname or '').lower()
+    if ':' in host:
+        host = f"[{host}]"  # IPv6 literal
+    if port is not None and DEFAULT_PORTS.get(parts.scheme.lower()) != port:
+        host = f"{host}:{port}"
+    if parts.username:
+        userinfo = parts.username + (f":{parts.password}" if parts.password else '')
+        host = f"{userinfo}@{host}"
+    return host
+
+# Dedup key for an already split URL: equivalent spellings (host case, default port, fragment,
+# query parameter order, trailing slash) map to the same string. The key is only used to
+# recognise pages already seen; it is not meant to be fetched or used as a base for
+# relative links, since dropping the trailing slash changes how those resolve.
+# `netloc` lets a caller that already computed canonical_netloc(parts) reuse it.
+def canonicalize_split(parts: SplitResult, netloc: str = None) -> str:
+    if netloc is None:
+        netloc = canonical_netloc(parts)
+    path = parts.path or '/'
+    if len(path) > 1:
+        path = path.rstrip('/') or '/'
+    # Parameters are reordered as-is, without decoding and re-encoding them
+    query = '&'.join(sorted(param for param in parts.query.split('&') if param))
+    return urlunsplit((parts.scheme.lower(), netloc, path, query, ''))
+
+def canonicalize_url(url: str) -> str:
+    parts = urlsplit(url)
+    if parts.scheme.lower() not in DEFAULT_PORTS:
+        return url
+    return canonicalize_split(parts)